@@ -0,0 +1,107 @@
+"""Число запросов к базе на аутентификацию по токену под нагрузкой.
+
+Запуск из backend/foodgram:
+
+    python ../benchmarks/auth.py --threads 8 --requests 2000
+
+Сравнивает TokenAuthentication из DRF и CachedTokenAuthentication на
+GET /api/users/me/. Созданный пользователь в конце удаляется.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "foodgram"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from api.authentication import CachedTokenAuthentication  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from recipes.models import User  # noqa: E402
+from rest_framework.authentication import TokenAuthentication  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+
+URL = "/api/users/me/"
+queries = []
+queries_lock = threading.Lock()
+
+
+def count_queries(execute, sql, params, many, context):
+    with queries_lock:
+        queries.append(sql)
+    return execute(sql, params, many, context)
+
+
+def watch(sender, connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def worker(key, total, errors):
+    client = Client(headers={"authorization": f"Token {key}"})
+    for _ in range(total):
+        if client.get(URL).status_code != 200:
+            errors.append(1)
+    connections.close_all()
+
+
+def run(authentication, key, threads, requests):
+    APIView.authentication_classes = [authentication]
+    cache.clear()
+    queries.clear()
+    errors = []
+    per_thread = requests // threads
+    pool = [
+        threading.Thread(target=worker, args=(key, per_thread, errors))
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done = per_thread * threads
+    auth_queries = sum("authtoken_token" in sql for sql in queries)
+    print(
+        f"{authentication.__name__}: {done / elapsed:.0f} запросов/с, "
+        f"запросов к базе на запрос {len(queries) / done:.2f}, "
+        f"из них на токен {auth_queries / done:.3f}, ошибок {len(errors)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection_created.connect(watch)
+    user = User.objects.create_user(
+        email="auth-benchmark@example.com",
+        username="auth-benchmark",
+        first_name="Бенчмарк",
+        last_name="Токена",
+    )
+    try:
+        key = Token.objects.create(user=user).key
+        for authentication in (TokenAuthentication, CachedTokenAuthentication):
+            run(authentication, key, args.threads, args.requests)
+    finally:
+        user.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Нагрузочный тест одного URL: запросы в секунду и задержки p50/p99.
+
+Сервер запускается отдельно из backend/foodgram, например под WSGI и
+под ASGI с одним воркером:
+
+    gunicorn -c gunicorn.conf.py -w 1 -b 127.0.0.1:8000
+    ASGI=True gunicorn -c gunicorn.conf.py -w 1 -b 127.0.0.1:8000
+
+и затем:
+
+    python ../benchmarks/load.py http://127.0.0.1:8000/api/recipes/ \\
+        --concurrency 50 --seconds 10
+
+Каждый запрос открывает новое соединение. --slow-ms задерживает
+отправку второй половины заголовков, как у медленного клиента.
+"""
+import argparse
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Load:
+    def __init__(self, url, headers, slow_ms, expect):
+        parts = urlsplit(url)
+        self.address = (parts.hostname, parts.port or 80)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        self.head = f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        self.tail = "".join(f"{header}\r\n" for header in headers) + (
+            "Accept: application/json\r\nConnection: close\r\n\r\n"
+        )
+        self.slow = slow_ms / 1000
+        self.expect = f"HTTP/1.1 {expect}".encode()
+        self.latencies = []
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def request(self):
+        started = time.perf_counter()
+        with socket.create_connection(self.address, timeout=30) as sock:
+            sock.sendall(self.head.encode())
+            if self.slow:
+                time.sleep(self.slow)
+            sock.sendall(self.tail.encode())
+            response = b""
+            while chunk := sock.recv(65536):
+                response += chunk
+        return response.startswith(self.expect), (
+            time.perf_counter() - started
+        ) * 1000
+
+    def worker(self, stop):
+        while time.monotonic() < stop:
+            try:
+                ok, latency = self.request()
+            except OSError:
+                ok, latency = False, None
+            with self.lock:
+                if ok:
+                    self.latencies.append(latency)
+                else:
+                    self.errors += 1
+
+    def run(self, concurrency, seconds, warmup):
+        self.worker(time.monotonic() + warmup)
+        self.latencies.clear()
+        self.errors = 0
+        stop = time.monotonic() + seconds
+        threads = [
+            threading.Thread(target=self.worker, args=(stop,))
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        latencies = sorted(self.latencies)
+        print(
+            f"{len(latencies) / seconds:.0f} запросов/с, "
+            f"p50 {percentile(latencies, 0.5):.1f} мс, "
+            f"p99 {percentile(latencies, 0.99):.1f} мс, "
+            f"ошибок {self.errors}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=1)
+    parser.add_argument("--slow-ms", type=int, default=0)
+    parser.add_argument("--expect", type=int, default=200)
+    parser.add_argument(
+        "--header", action="append", default=[],
+        help='Дополнительный заголовок, например "Authorization: Token ..."',
+    )
+    args = parser.parse_args()
+    Load(args.url, args.header, args.slow_ms, args.expect).run(
+        args.concurrency, args.seconds, args.warmup
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Задержки /api/recipes/ с пулом соединений к базе и без него.
+
+Запуск из backend/foodgram:
+
+    python ../benchmarks/pool.py --concurrency 1 --seconds 10
+
+Сервер gunicorn с одним воркером запускается по очереди с пулом, без
+пула (новое соединение на каждый запрос) и с постоянными соединениями
+CONN_MAX_AGE. Запросы идут с токеном, чтобы ответ не брался из кэша
+анонимных ответов. Остальные настройки (ASGI, база) берутся из
+окружения.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+FOODGRAM = Path(__file__).resolve().parent.parent / "foodgram"
+sys.path.insert(0, str(FOODGRAM))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from load import Load  # noqa: E402
+from recipes.models import User  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+SETUPS = (
+    ("пул", {"DB_POOL": "True"}),
+    ("без пула", {"DB_POOL": "False", "DB_CONN_MAX_AGE": "0"}),
+    ("CONN_MAX_AGE=60", {"DB_POOL": "False", "DB_CONN_MAX_AGE": "60"}),
+)
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер не запустился на порту {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--path", default="/api/recipes/?limit=6")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    user = User.objects.create_user(
+        email="pool-benchmark@example.com",
+        username="pool-benchmark",
+        first_name="Бенчмарк",
+        last_name="Пула",
+    )
+    try:
+        header = f"Authorization: Token {Token.objects.create(user=user).key}"
+        for label, env in SETUPS:
+            server = subprocess.Popen(
+                [
+                    "gunicorn", "-c", "gunicorn.conf.py", "-w", "1",
+                    "-b", f"127.0.0.1:{args.port}",
+                ],
+                cwd=FOODGRAM,
+                env={**os.environ, **env},
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for(args.port)
+                print(f"{label}: ", end="", flush=True)
+                Load(
+                    f"http://127.0.0.1:{args.port}{args.path}",
+                    [header], slow_ms=0, expect=200,
+                ).run(args.concurrency, args.seconds, warmup=1)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        user.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Проверка того, что поиск рецептов использует индексы на большой таблице.
+
+Запуск из backend/foodgram:
+
+    python ../benchmarks/search.py --recipes 1000000
+
+Рецепты создаются в транзакции, которая в конце откатывается.
+"""
+import argparse
+import os
+import sys
+import time
+from itertools import product
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "foodgram"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from api.filters import RecipeFilter  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from recipes.models import Recipe, User  # noqa: E402
+
+SYLLABLES = (
+    "ба", "ве", "ги", "до", "жу", "за", "ки", "ло", "ма", "не",
+    "по", "ру", "са", "ти", "фу", "ха", "це", "ча", "ша", "ю",
+)
+# 8000 выдуманных слов, чтобы каждое встречалось в небольшой доле рецептов.
+WORDS = ["".join(word) for word in product(SYLLABLES, repeat=3)]
+# (описание, строка поиска): слово, фраза из названия рецепта 100
+# и опечатка в слове для поиска по триграммам.
+SEARCHES = (
+    ("слово", WORDS[1234]),
+    ("фраза", f"{WORDS[100]} {WORDS[700]}"),
+    ("опечатка", f"{WORDS[100][:3]}о{WORDS[100][4:]} {WORDS[700]}"),
+)
+INDEXES = ("recipe_search_idx", "recipe_name_trgm_idx")
+
+
+def seed(total):
+    author = User.objects.create_user(
+        email="search-benchmark@example.com",
+        username="search-benchmark",
+        first_name="Бенчмарк",
+        last_name="Поиска",
+    )
+    size = len(WORDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {Recipe._meta.db_table} "
+            "(name, text, image, cooking_time, author_id, short_code, "
+            "clicks, favorites_count, carts_count, created_at, updated_at) "
+            f"SELECT initcap(w[1 + mod(i, {size})]) || ' ' || "
+            f"w[1 + mod(i * 7, {size})], "
+            f"'Возьмите ' || w[1 + mod(i * 11, {size})] || ' и ' || "
+            f"w[1 + mod(i * 13, {size})] || ', готовьте до готовности.', "
+            "'recipes/benchmark.png', 30, %s, lpad(to_hex(i), 6, '0'), "
+            "0, 0, 0, now(), now() "
+            "FROM generate_series(1, %s) AS i, "
+            "(SELECT %s::text[] AS w) AS words "
+            "ON CONFLICT DO NOTHING",
+            [author.pk, total, list(WORDS)],
+        )
+        cursor.execute(f"ANALYZE {Recipe._meta.db_table}")
+
+
+def search(value, limit):
+    return RecipeFilter(
+        {"search": value}, queryset=Recipe.objects.defer("search_vector")
+    ).qs[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=6)
+    args = parser.parse_args()
+
+    index_backed = True
+    with transaction.atomic():
+        started = time.perf_counter()
+        seed(args.recipes)
+        print(f"Создано {args.recipes} рецептов за "
+              f"{time.perf_counter() - started:.1f} с")
+        for label, value in SEARCHES:
+            plan = search(value, args.limit).explain(analyze=True)
+            used = [index for index in INDEXES if index in plan]
+            seq_scan = "Seq Scan on recipes_recipe" in plan
+            index_backed &= bool(used) and not seq_scan
+            started = time.perf_counter()
+            found = len(search(value, args.limit))
+            elapsed = (time.perf_counter() - started) * 1000
+            print(
+                f"{label} {value!r}: найдено {found}, {elapsed:.1f} мс, "
+                f"индексы {', '.join(used) or 'нет'}"
+                f"{', seq scan' if seq_scan else ''}"
+            )
+            if os.getenv("BENCHMARK_VERBOSE"):
+                print(plan)
+        transaction.set_rollback(True)
+    sys.exit(0 if index_backed else 1)
+
+
+if __name__ == "__main__":
+    main()
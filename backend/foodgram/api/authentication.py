@@ -0,0 +1,51 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from recipes.models import User
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+# Поля, которые не попадают в кэш: хэш пароля и счётчики, которые
+# меняются через update() и не сбрасывали бы кэш.
+UNCACHED_USER_FIELDS = ("password", *User.counter_fields)
+
+
+def token_cache_key(key):
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(*keys):
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, запоминающая токен с пользователем в кэше.
+
+    Кэш используется только для чтения: запросы на изменение получают
+    пользователя из базы, чтобы не сохранить устаревшие данные.
+    """
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not self.use_cache:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            token = self.get_model().objects.select_related("user").defer(
+                *(f"user__{name}" for name in UNCACHED_USER_FIELDS)
+            ).filter(key=key).first()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return token.user, token
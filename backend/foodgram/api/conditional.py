@@ -0,0 +1,24 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def conditional_response(request, render, etag, last_modified=None,
+                         personalized=False):
+    timestamp = last_modified and int(last_modified.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = render()
+        response["ETag"] = etag
+        if timestamp:
+            response["Last-Modified"] = http_date(timestamp)
+    if personalized:
+        patch_vary_headers(response, ["Authorization"])
+    return response
@@ -1,9 +1,13 @@
 from django_filters import rest_framework as filters
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramSimilarity
+)
+from django.db.models import F, Q
 from recipes.models import Recipe, Ingredient
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name="name", lookup_expr="startswith")
+    name = filters.CharFilter(field_name="name", lookup_expr="istartswith")
 
     class Meta:
         model = Ingredient
@@ -16,17 +20,27 @@ class RecipeFilter(filters.FilterSet):
         method="filter_is_in_shopping_cart"
     )
     author = filters.NumberFilter(field_name="author__id")
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
-        fields = ["author", "is_favorited", "is_in_shopping_cart"]
+        fields = ["author", "is_favorited", "is_in_shopping_cart", "search"]
+
+    def filter_search(self, recipes, name, value):
+        query = SearchQuery(value, config="russian", search_type="websearch")
+        return recipes.filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).annotate(
+            search_rank=SearchRank(F("search_vector"), query),
+            name_similarity=TrigramSimilarity("name", value),
+        ).order_by("-search_rank", "-name_similarity", "name", "id")
 
     def filter_is_favorited(self, recipes, name, value):
         if value and self.request.user.is_authenticated:
-            return recipes.filter(favorites__user=self.request.user)
+            return recipes.filter(is_favorited=True)
         return recipes
 
     def filter_is_in_shopping_cart(self, recipes, name, value):
         if value and self.request.user.is_authenticated:
-            return recipes.filter(carts__user=self.request.user)
+            return recipes.filter(is_in_shopping_cart=True)
         return recipes
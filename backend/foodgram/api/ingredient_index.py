@@ -0,0 +1,56 @@
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice, takewhile
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def invalidate(self):
+        self._data = None
+
+    def _load(self):
+        data = self._data
+        if data is not None and time.monotonic() < data[2]:
+            return data
+        with self._lock:
+            if self._data is data:
+                rows = sorted(
+                    Ingredient.objects.values(
+                        "name", "measurement_unit", "id", "updated_at"
+                    ).iterator(),
+                    key=lambda row: (row["name"].casefold(), row["id"]),
+                )
+                updated_at = max(
+                    (row.pop("updated_at") for row in rows), default=None
+                )
+                self._data = (
+                    [row["name"].casefold() for row in rows],
+                    rows,
+                    time.monotonic() + settings.INGREDIENT_INDEX_TTL,
+                    (len(rows), updated_at),
+                )
+            return self._data
+
+    @property
+    def version(self):
+        return self._load()[3]
+
+    def search(self, prefix="", limit=None):
+        keys, rows, *_ = self._load()
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        matches = takewhile(
+            lambda i: keys[i].startswith(prefix), range(start, len(keys))
+        )
+        return [rows[i] for i in islice(matches, limit)]
+
+
+ingredient_index = IngredientIndex()
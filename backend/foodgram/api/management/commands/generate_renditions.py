@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from jobs.runner import enqueue
+from recipes import tasks
+from recipes.models import Recipe, User
+
+
+class Command(BaseCommand):
+    help = 'Постановка в очередь генерации превью для загруженных изображений'
+
+    def handle(self, *args, **options):
+        names = {
+            *Recipe.objects.exclude(image="").values_list("image", flat=True),
+            *User.objects.exclude(avatar="").exclude(
+                avatar=None
+            ).values_list("avatar", flat=True),
+        }
+        for name in names:
+            enqueue(tasks.generate_renditions, name=name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено задач: {len(names)}'))
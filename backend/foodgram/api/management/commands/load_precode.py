@@ -1,23 +1,122 @@
+import csv
 import json
-from django.core.management.base import BaseCommand
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
 from recipes.models import Ingredient
 
+from api import response_cache
+from api.ingredient_index import ingredient_index
+
+FIELDS = ("name", "measurement_unit")
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if not row or tuple(row[:2]) == FIELDS:
+            continue
+        yield row[0], row[1] if len(row) > 1 else ""
+
+
+def read_json(file):
+    # Элементы массива разбираются по одному, чтобы не держать весь
+    # справочник в памяти.
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    while True:
+        position = 0
+        while True:
+            while (position < len(buffer)
+                   and buffer[position] in " \t\r\n[,]"):
+                position += 1
+            if position == len(buffer):
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                break
+            yield item["name"], item["measurement_unit"]
+        buffer = buffer[position:]
+        if eof:
+            return
+        chunk = file.read(READ_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+READERS = {".csv": read_csv, ".json": read_json}
+
 
 class Command(BaseCommand):
-    help = 'Импорт данных из прекода'
+    help = 'Импорт ингредиентов из CSV или JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="*", default=["ingredients.json"],
+            help="Файлы .csv или .json с полями name и measurement_unit",
+        )
 
     def handle(self, *args, **options):
-        try:
-            with open("ingredients.json") as f:
-                Ingredient.objects.bulk_create(
-                    [Ingredient(
-                        **i
-                    ) for i in json.load(f)],
-                    ignore_conflicts=True
+        for path in map(Path, options["paths"]):
+            reader = READERS.get(path.suffix.lower())
+            if reader is None:
+                raise CommandError(f"Неизвестный формат файла {path}")
+            try:
+                with open(path, encoding="utf-8", newline="") as file:
+                    read, inserted, total = self.load(reader(file))
+            except (
+                OSError, ValueError, KeyError, TypeError, DatabaseError
+            ) as e:
+                raise CommandError(
+                    "Произошла ошибка при загрузке данных из файла "
+                    f"{path}: {e!r}"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: прочитано {read}, добавлено {inserted}, "
+                f"обновлено 0, без изменений {total - inserted}"
+            ))
+            if inserted:
+                ingredient_index.invalidate()
+                transaction.on_commit(
+                    lambda: response_cache.bump("recipes", "ingredients")
                 )
-                self.stdout.write(self.style.SUCCESS(
-                    f'Импорт завершен. Число новых \
-                    записей - {Ingredient.objects.count()}'))
-        except Exception as e:
-            print("Произошла ошибка при загрузке данных",
-                  f"из файла ingredients.json: {e}")
+
+    @transaction.atomic
+    def load(self, rows):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        read = 0
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE ingredient_staging "
+                "(name text, measurement_unit text) ON COMMIT DROP"
+            )
+            with cursor.copy(
+                "COPY ingredient_staging (name, measurement_unit) "
+                "FROM STDIN"
+            ) as copy:
+                for row in rows:
+                    name, measurement_unit = (value.strip() for value in row)
+                    if name:
+                        copy.write_row((name, measurement_unit))
+                        read += 1
+            cursor.execute(
+                "SELECT count(*) FROM (SELECT DISTINCT name, "
+                "measurement_unit FROM ingredient_staging) AS rows"
+            )
+            total = cursor.fetchone()[0]
+            # Все поля с данными входят в уникальный ключ: существующая
+            # строка либо совпадает, либо это другой ингредиент.
+            cursor.execute(
+                f"INSERT INTO {table} "
+                "(name, measurement_unit, updated_at, recipes_count) "
+                "SELECT DISTINCT name, measurement_unit, now(), 0 "
+                "FROM ingredient_staging "
+                "ON CONFLICT (name, measurement_unit) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+        return read, inserted, total
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Cart, ShoppingListItem
+from recipes.shopping_list import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересборка списков покупок по корзинам пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "users", nargs="*", type=int,
+            help="id пользователей, по умолчанию все с корзиной или списком",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["users"] or sorted({
+            *Cart.objects.values_list("user", flat=True),
+            *ShoppingListItem.objects.values_list("user", flat=True),
+        })
+        for user_id in user_ids:
+            rebuild(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано списков: {len(user_ids)}'))
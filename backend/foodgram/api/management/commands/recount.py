@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, корзин, рецептов и подписок'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for counter, repaired in counters.recount().items():
+            self.stdout.write(f"{counter}: исправлено {repaired}")
+        self.stdout.write(self.style.SUCCESS('Пересчёт завершен'))
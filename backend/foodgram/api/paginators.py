@@ -1,8 +1,151 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    LimitOffsetPagination, PageNumberPagination
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def table_estimate(queryset):
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row else -1
+
+
+def planner_estimate(queryset):
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset):
+    strategy = settings.PAGINATION_COUNT_STRATEGY
+    exact_limit = settings.PAGINATION_EXACT_COUNT_LIMIT
+    query = queryset.query
+    if (strategy == 'exact' or query.is_sliced or query.distinct
+            or connections[queryset.db].vendor != 'postgresql'):
+        return queryset.count()
+
+    if query.where:
+        count = queryset[:exact_limit + 1].count()
+        if count <= exact_limit:
+            return count
+        return max(count, planner_estimate(queryset))
+
+    if strategy == 'cache':
+        return cache.get_or_set(
+            f'count:{queryset.model._meta.db_table}',
+            queryset.count,
+            settings.PAGINATION_COUNT_CACHE_TIMEOUT,
+        )
+    count = table_estimate(queryset)
+    if count < exact_limit:
+        return queryset.count()
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class EstimatedLimitOffsetPagination(LimitOffsetPagination):
+    def get_count(self, queryset):
+        return estimate_count(queryset)
 
 
 class PageLimitPagination(PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
     page_size_query_param = 'limit'
     page_size = 6
     max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        name, pk, reverse = self.decode_cursor(request)
+        if reverse:
+            queryset = queryset.order_by('-name', '-id')
+            if name is not None:
+                queryset = queryset.filter(
+                    Q(name__lte=name) & (Q(name__lt=name) | Q(id__lt=pk))
+                )
+        else:
+            queryset = queryset.order_by('name', 'id')
+            if name is not None:
+                queryset = queryset.filter(
+                    Q(name__gte=name) & (Q(name__gt=name) | Q(id__gt=pk))
+                )
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = name is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, name is not None
+        self.page_results = results
+        return results
+
+    def decode_cursor(self, request):
+        token = request.query_params[self.cursor_query_param]
+        if not token:
+            return None, None, False
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            return str(position['n']), int(position['i']), bool(position['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, recipe, reverse):
+        position = {'n': recipe.name, 'i': recipe.pk, 'r': reverse}
+        token = base64.urlsafe_b64encode(
+            json.dumps(position, ensure_ascii=False).encode()
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[0], reverse=True)
 
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
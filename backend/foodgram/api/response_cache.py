@@ -0,0 +1,52 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+
+def version_key(scope):
+    return f"version:{scope}"
+
+
+def get_versions(*scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.add(version_key(scope), time.time_ns(), None)
+
+
+def response_key(request, versions):
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        for value in values
+    )
+    # Схема и хост входят в ключ: в ответах абсолютные ссылки.
+    return "response:" + hashlib.md5(repr((
+        request.build_absolute_uri("/"), request.path, params, versions
+    )).encode()).hexdigest()
+
+
+def cached_response(request, scopes, render):
+    key = response_key(request, get_versions(*scopes))
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+
+    response = render()
+    if response.status_code == 200:
+        cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+    return response
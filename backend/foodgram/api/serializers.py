@@ -2,13 +2,34 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from recipes import models
 from recipes.models import Follow, Favorite, Cart
-from django.core.files.base import ContentFile
+from recipes import counters, renditions, shopping_list
+from recipes.signals import products_saved_with_recipe
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, TemporaryUploadedFile
+)
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.db.models.manager import BaseManager
+from api.response_cache import get_versions
+import hashlib
 import base64
+import binascii
+from io import BytesIO
+from PIL import Image
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 
 
 User = get_user_model()
 
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,22 +37,109 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ["name", "measurement_unit", "id"]
 
 
+class RenditionField(serializers.ReadOnlyField):
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        super().__init__(**kwargs)
+
+    def to_representation(self, image):
+        url = renditions.get_url(image, self.rendition)
+        request = self.context.get("request")
+        if url and request:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class ForReadRecipeSerializer(serializers.ModelSerializer):
+    thumbnail = RenditionField("thumbnail", source="image")
+
     class Meta:
         model = models.Recipe
-        fields = ("id", "name", "cooking_time", "image")
+        fields = ("id", "name", "cooking_time", "image", "thumbnail")
         read_only_fields = fields
 
 
+def sniff_image_extension(head):
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
 class Base64Serializer(serializers.ImageField):
+    chunk_size = 64 * 1024
+    default_error_messages = {
+        "too_large": "Размер изображения не должен превышать {max_size} байт.",
+        "too_many_pixels": (
+            "Изображение не должно содержать больше {max_pixels} пикселей."
+        ),
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
-            format, imgstr = data.split(";base64,")
-            ext = format.split("/")[-1]
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+            data = self.decode(data)
 
         return super().to_internal_value(data)
 
+    def decode(self, data):
+        offset = data.find(";base64,")
+        if offset == -1:
+            self.fail("invalid_image")
+        offset += len(";base64,")
+        size = (len(data) - offset) // 4 * 3
+        if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.fail("too_large", max_size=settings.IMAGE_UPLOAD_MAX_SIZE)
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = TemporaryUploadedFile("temp", "image", size, None)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, "temp", "image", size, None
+            )
+
+        ext = None
+        rest = ""
+        try:
+            for start in range(offset, len(data), self.chunk_size):
+                # Пробелы и переносы строк отбрасываются, неполная группа
+                # символов переносится в следующий фрагмент.
+                text = rest + "".join(
+                    data[start:start + self.chunk_size].split()
+                )
+                usable = len(text) // 4 * 4
+                rest = text[usable:]
+                chunk = base64.b64decode(text[:usable], validate=True)
+                if not chunk:
+                    continue
+                if ext is None:
+                    ext = sniff_image_extension(chunk)
+                    if ext is None:
+                        self.fail("invalid_image")
+                file.write(chunk)
+        except binascii.Error:
+            self.fail("invalid_image")
+        if ext is None or rest:
+            self.fail("invalid_image")
+
+        file.size = file.tell()
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            self.fail("invalid_image")
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.fail(
+                "too_many_pixels",
+                max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS,
+            )
+
+        file.seek(0)
+        file.name = f"temp.{ext}"
+        file.content_type = f"image/{ext}"
+        return file
+
 
 class AvatarSerializer(serializers.ModelSerializer):
     avatar = Base64Serializer(required=True)
@@ -44,6 +152,7 @@ class AvatarSerializer(serializers.ModelSerializer):
 class FoodgramUserSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64Serializer(required=False)
+    avatar_thumbnail = RenditionField("thumbnail", source="avatar")
 
     class Meta:
         model = User
@@ -53,12 +162,15 @@ class FoodgramUserSerializer(DjoserUserSerializer):
             "username",
             "last_name",
             "avatar", 
+            "avatar_thumbnail",
             "is_subscribed",
             "id",
         ]
         required_fields = fields
 
     def get_is_subscribed(self, obj): 
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request") 
         if request and request.user.is_authenticated: 
             return Follow.objects.filter( 
@@ -69,7 +181,6 @@ class FoodgramUserSerializer(DjoserUserSerializer):
 
 class FoodgramUserWithRecipesSerializer(FoodgramUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source='recipes.count')
 
     class Meta:
         model = User
@@ -78,6 +189,11 @@ class FoodgramUserWithRecipesSerializer(FoodgramUserSerializer):
         read_only_fields = fields
 
     def get_recipes(self, obj): 
+        if hasattr(obj, "recipes_preview"):
+            return ForReadRecipeSerializer(
+                obj.recipes_preview, many=True
+            ).data
+
         request = self.context.get("request") 
         if not request: 
             return [] 
@@ -91,9 +207,7 @@ class FoodgramUserWithRecipesSerializer(FoodgramUserSerializer):
 
 
 class RecipeProductSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=models.Ingredient.objects.all(), source="ingredient"
-    )
+    id = serializers.IntegerField(source="ingredient_id", min_value=1)
     name = serializers.CharField(source="ingredient.name", read_only=True)
     measurement_unit = serializers.CharField(
         source="ingredient.measurement_unit", read_only=True
@@ -105,6 +219,65 @@ class RecipeProductSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "measurement_unit", "amount"]
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+    def validate_recipes(self, recipes):
+        return list(dict.fromkeys(recipes))
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="ingredient.id")
+    name = serializers.CharField(source="ingredient.name")
+    measurement_unit = serializers.CharField(
+        source="ingredient.measurement_unit"
+    )
+
+    class Meta:
+        model = models.ShoppingListItem
+        fields = ["id", "name", "measurement_unit", "amount"]
+        read_only_fields = fields
+
+
+def products_prefetch():
+    return Prefetch(
+        "products",
+        queryset=models.ProductInRecipe.objects.select_related("ingredient"),
+    )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, BaseManager) else data
+        )
+        ingredients_version, = get_versions("ingredients")
+        keys = {
+            recipe.pk: self.child.cache_key(recipe, ingredients_version)
+            for recipe in recipes
+        }
+        shared = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in shared
+        ]
+        if missing:
+            prefetch_related_objects(missing, products_prefetch())
+            fresh = {
+                keys[recipe.pk]: self.child.shared_representation(recipe)
+                for recipe in missing
+            }
+            cache.set_many(fresh, settings.RESPONSE_CACHE_TIMEOUT)
+            shared.update(fresh)
+        return [
+            self.child.personalize(recipe, shared[keys[recipe.pk]])
+            for recipe in recipes
+        ]
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = FoodgramUserSerializer(read_only=True)
     ingredients = RecipeProductSerializer(
@@ -115,23 +288,48 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64Serializer(required=True)
+    thumbnail = RenditionField("thumbnail", source="image")
+    image_webp = RenditionField("webp", source="image")
     cooking_time = serializers.IntegerField(min_value=1)
+    personal_fields = ("is_favorited", "is_in_shopping_cart")
 
     class Meta:
         model = models.Recipe
-        fields = "__all__"
+        fields = (
+            "id",
+            "author",
+            "ingredients",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "image",
+            "thumbnail",
+            "image_webp",
+            "cooking_time",
+            "name",
+            "text",
+        )
+        list_serializer_class = RecipeListSerializer
 
     def validate_ingredients(self, value):
-        s = set()
         if value == []:
             raise serializers.ValidationError("Список игредиентов пуст!")
-        for i in value:
-            s.add(i["ingredient"].name)
-        if len(value) != len(s):
+        ids = [item["ingredient_id"] for item in value]
+        if len(ids) != len(set(ids)):
             raise serializers.ValidationError(
                 "Ингредиенты не должны повторяться!"
             )
-        return value
+        ingredients = models.Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                "Ингредиенты не найдены: "
+                + ", ".join(map(str, missing))
+            )
+        return [
+            {"ingredient": ingredients[item["ingredient_id"]],
+             "amount": item["amount"]}
+            for item in value
+        ]
 
     def create_products(self, recipe, ingredients_data):
         models.ProductInRecipe.objects.bulk_create(
@@ -142,21 +340,108 @@ class RecipeSerializer(serializers.ModelSerializer):
             ) for ingredient_data in ingredients_data
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop("products")
         recipe = super().create(validated_data)
         self.create_products(recipe, ingredients_data)
+        counters.recipe_created(recipe, [
+            ingredient_data["ingredient"].pk
+            for ingredient_data in ingredients_data
+        ])
 
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         ingredients_data = validated_data.pop("products")
-        recipe.products.all().delete()
-        self.create_products(recipe, ingredients_data)
+        new_amounts = {
+            ingredient_data["ingredient"].pk: ingredient_data["amount"]
+            for ingredient_data in ingredients_data
+        }
+        old_amounts, to_update, to_delete = {}, [], []
+        for product in models.ProductInRecipe.objects.filter(recipe=recipe):
+            ingredient_id = product.ingredient_id
+            amount = new_amounts.get(ingredient_id)
+            old_amounts[ingredient_id] = (
+                old_amounts.get(ingredient_id, 0) + product.amount
+            )
+            if amount is None or old_amounts[ingredient_id] != product.amount:
+                # Убранный ингредиент или оставшийся дубликат строки.
+                to_delete.append(product.pk)
+            elif product.amount != amount:
+                product.amount = amount
+                to_update.append(product)
+        models.ProductInRecipe.objects.bulk_create(
+            models.ProductInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in old_amounts
+        )
+        models.ProductInRecipe.objects.bulk_update(to_update, ["amount"])
+        # Рецепт сохраняется ниже, в super().update().
+        with products_saved_with_recipe():
+            models.ProductInRecipe.objects.filter(pk__in=to_delete).delete()
+        counters.ingredients_changed(
+            new_amounts.keys() - old_amounts.keys(),
+            old_amounts.keys() - new_amounts.keys(),
+        )
+        shopping_list.change_recipe(recipe, old_amounts, new_amounts)
 
         return super().update(recipe, validated_data)
 
+    def to_representation(self, recipe):
+        key = self.cache_key(recipe, *get_versions("ingredients"))
+        shared = cache.get(key)
+        if shared is None:
+            shared = self.shared_representation(recipe)
+            cache.set(key, shared, settings.RESPONSE_CACHE_TIMEOUT)
+        return self.personalize(recipe, shared)
+
+    def cache_key(self, recipe, ingredients_version):
+        request = self.context.get("request")
+        return "recipe:" + hashlib.md5(repr((
+            recipe.pk,
+            recipe.updated_at,
+            recipe.author.updated_at,
+            ingredients_version,
+            request and request.build_absolute_uri("/"),
+        )).encode()).hexdigest()
+
+    def shared_representation(self, recipe):
+        prefetch_related_objects([recipe], products_prefetch())
+        recipe.author.is_subscribed = None
+        data = {}
+        for field in self._readable_fields:
+            if field.field_name in self.personal_fields:
+                data[field.field_name] = None
+                continue
+            attribute = field.get_attribute(recipe)
+            data[field.field_name] = (
+                None if attribute is None
+                else field.to_representation(attribute)
+            )
+        del recipe.author.is_subscribed
+        return data
+
+    def personalize(self, recipe, shared):
+        if hasattr(recipe, "author_is_subscribed"):
+            is_subscribed = recipe.author_is_subscribed
+        else:
+            is_subscribed = self.fields["author"].get_is_subscribed(
+                recipe.author
+            )
+        return {
+            **shared,
+            "author": {**shared["author"], "is_subscribed": is_subscribed},
+            "is_favorited": self.get_is_favorited(recipe),
+            "is_in_shopping_cart": self.get_is_in_shopping_cart(recipe),
+        }
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return Favorite.objects.filter(
@@ -165,6 +450,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return Cart.objects.filter(user=request.user, recipe=obj).exists()
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe
+
+from . import response_cache
+from .authentication import forget_tokens
+from .ingredient_index import ingredient_index
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    ingredient_index.invalidate()
+    transaction.on_commit(
+        lambda: response_cache.bump("recipes", "ingredients")
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    author_id = instance.author_id
+    transaction.on_commit(
+        lambda: response_cache.bump("recipes", f"author:{author_id}")
+    )
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    user_id = instance.pk
+    transaction.on_commit(
+        lambda: response_cache.bump("recipes", f"author:{user_id}")
+    )
+    keys = list(Token.objects.filter(user=user_id).values_list(
+        "key", flat=True
+    ))
+    if keys:
+        transaction.on_commit(lambda: forget_tokens(*keys))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: forget_tokens(key))
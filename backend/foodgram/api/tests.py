@@ -0,0 +1,185 @@
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.models import (
+    Follow, Ingredient, ProductInRecipe, Recipe, User
+)
+from rest_framework.test import APIClient
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="reader@example.com", username="reader",
+            first_name="Читатель", last_name="Тестовый", password="pass",
+        )
+        authors = User.objects.bulk_create(
+            User(
+                email=f"author{index}@example.com",
+                username=f"author{index}",
+                first_name="Автор",
+                last_name=str(index),
+            )
+            for index in range(10)
+        )
+        Follow.objects.create(follower=cls.user, user=authors[0])
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+            for index in range(5)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f"Рецепт {index:03}",
+                text="Описание",
+                cooking_time=10,
+                image="recipes/test.png",
+                author=authors[index % len(authors)],
+            )
+            for index in range(100)
+        )
+        ProductInRecipe.objects.bulk_create(
+            ProductInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in ingredients[:3]
+        )
+        cls.user.favorites.create(recipe=recipes[0])
+        cls.user.carts.create(recipe=recipes[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_page_size_does_not_change_query_count(self):
+        for limit in (6, 50, 100):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(3):
+                    response = self.client.get(
+                        "/api/recipes/", {"limit": limit}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["results"]), limit)
+
+
+class ShoppingListTest(TestCase):
+    """Список покупок следует за корзиной и составом рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Счётчики заданы вручную: bulk_create их не обновляет.
+        cls.user, cls.author = User.objects.bulk_create(
+            User(
+                email=f"{name}@example.com", username=name,
+                first_name="Тест", last_name=name, recipes_count=count,
+            )
+            for name, count in (("buyer", 0), ("cook", 2))
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f"Ингредиент {index}", measurement_unit="г",
+                recipes_count=count,
+            )
+            for index, count in enumerate((2, 1, 0))
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=10,
+                image="recipes/test.png",
+                author=cls.author,
+            )
+            for index in range(2)
+        )
+        first, second, third = cls.ingredients
+        ProductInRecipe.objects.bulk_create([
+            ProductInRecipe(recipe=cls.recipes[0], ingredient=first,
+                            amount=100),
+            ProductInRecipe(recipe=cls.recipes[0], ingredient=second,
+                            amount=2),
+            ProductInRecipe(recipe=cls.recipes[1], ingredient=first,
+                            amount=50),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def shopping_list(self):
+        return dict(self.user.shopping_list.values_list(
+            "ingredient", "amount"
+        ))
+
+    def add_to_cart(self, *recipes):
+        for recipe in recipes:
+            response = self.client.post(
+                f"/api/recipes/{recipe.pk}/shopping_cart/"
+            )
+            self.assertEqual(response.status_code, 201)
+
+    def test_add_sums_amounts(self):
+        first, second, _ = self.ingredients
+        self.add_to_cart(*self.recipes)
+        self.assertEqual(
+            self.shopping_list(), {first.pk: 150, second.pk: 2}
+        )
+
+    def test_remove_subtracts_and_drops_empty_rows(self):
+        first, _, _ = self.ingredients
+        self.add_to_cart(*self.recipes)
+        response = self.client.delete(
+            f"/api/recipes/{self.recipes[0].pk}/shopping_cart/"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.shopping_list(), {first.pk: 50})
+
+    def test_recipe_change_updates_list(self):
+        first, second, third = self.ingredients
+        self.add_to_cart(*self.recipes)
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.patch(
+            f"/api/recipes/{self.recipes[0].pk}/",
+            {"ingredients": [
+                {"id": first.pk, "amount": 10},
+                {"id": third.pk, "amount": 3},
+            ]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.shopping_list(), {first.pk: 60, third.pk: 3}
+        )
+
+    def test_recipe_delete_removes_its_ingredients(self):
+        first, _, _ = self.ingredients
+        self.add_to_cart(*self.recipes)
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.delete(f"/api/recipes/{self.recipes[0].pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.shopping_list(), {first.pk: 50})
+
+
+class ShortCodeTest(TestCase):
+    """Совпавший короткий код заменяется новым, а не ломает сохранение."""
+
+    def test_collision_regenerates_code(self):
+        author = User.objects.create_user(
+            email="cook@example.com", username="cook",
+            first_name="Автор", last_name="Тестовый",
+        )
+        fields = {
+            "text": "Описание", "cooking_time": 10,
+            "image": "recipes/test.png", "author": author,
+        }
+        first = Recipe.objects.create(name="Первый", **fields)
+        second = Recipe.objects.create(
+            name="Второй", short_code=first.short_code, **fields
+        )
+        self.assertNotEqual(second.short_code, first.short_code)
+        self.assertEqual(len(second.short_code), 6)
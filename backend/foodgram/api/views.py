@@ -1,8 +1,9 @@
 from . import serializers
 from rest_framework.response import Response
-from recipes import models
+from recipes import counters, models
+from recipes.shopping_list import add_recipes, deferred_removals
 from recipes.models import Follow, Favorite, Cart
-from rest_framework import viewsets, pagination
+from rest_framework import viewsets
 from rest_framework.decorators import action
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -14,27 +15,67 @@ from rest_framework import permissions
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import RecipeFilter, IngredientFilter
 from .paginators import PageLimitPagination
+from .paginators import EstimatedLimitOffsetPagination
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Exists, F, OuterRef
+from django.db.models import Value
+from django.db.models import Max, Window
+from django.db.models.functions import RowNumber
+from collections import defaultdict
 from datetime import datetime
 import csv
-from django.http import FileResponse
+from django.http import StreamingHttpResponse
 from .permissions import AuthorOrReading
-import os
-from tempfile import NamedTemporaryFile
+from .ingredient_index import ingredient_index
+from .conditional import conditional_response, make_etag
+from .response_cache import cached_response
+from rest_framework.generics import get_object_or_404 as get_or_404
+from django.conf import settings
+from django.db import IntegrityError, transaction
 
 
 User = get_user_model()
 
 
+class EchoBuffer:
+    def write(self, value):
+        return value
+
+
 class FoodgramUserViewSet(UserViewSet):
-    pagination_class = pagination.LimitOffsetPagination
+    pagination_class = EstimatedLimitOffsetPagination
     permission_classes = (AuthorOrReading,)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context["request"] = self.request
         return context
-    
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        counters.user_deleted(instance)
+        super().perform_destroy(instance)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.action == "me":
+            user = request.user
+            updated_at, is_subscribed = user.updated_at, False
+        else:
+            updated_at, is_subscribed = get_or_404(
+                self.get_queryset().annotate(
+                    is_subscribed=Exists(Follow.objects.filter(
+                        follower=request.user.pk, user=OuterRef("pk")))
+                ).values_list("updated_at", "is_subscribed"),
+                pk=kwargs[self.lookup_field],
+            )
+        return conditional_response(
+            request,
+            lambda: super(FoodgramUserViewSet, self).retrieve(
+                request, *args, **kwargs),
+            etag=make_etag(updated_at, is_subscribed),
+            personalized=True,
+        )
+
     @action(methods=["get", "put", "patch", "delete"],
             detail=False, permission_classes=[permissions.IsAuthenticated])
     def me(self, request, *args, **kwargs):
@@ -55,8 +96,7 @@ class FoodgramUserViewSet(UserViewSet):
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
-        
-        user.avatar.delete(save=False)
+
         user.avatar = None
         user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -67,13 +107,38 @@ class FoodgramUserViewSet(UserViewSet):
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request, *args, **kwargs):
         user = request.user
-        queryset = User.objects.filter(follows_user__follower=user)
+        queryset = User.objects.filter(
+            follows_user__follower=user
+        ).annotate(
+            is_subscribed=Value(True),
+        )
         page = self.paginate_queryset(queryset)
+        self.attach_recipes_preview(page)
         serializier = serializers.FoodgramUserWithRecipesSerializer(
             page, many=True, context=self.get_serializer_context()
         )
         return self.get_paginated_response(data=serializier.data)
 
+    def attach_recipes_preview(self, users):
+        recipes = models.Recipe.objects.filter(
+            author__in=users
+        ).defer("search_vector").annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F("author"),
+                order_by=F("name").asc(),
+            )
+        )
+        recipes_limit = self.request.query_params.get("recipes_limit")
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.filter(row_number__lte=int(recipes_limit))
+
+        previews = defaultdict(list)
+        for recipe in recipes.order_by("author", "row_number"):
+            previews[recipe.author_id].append(recipe)
+        for user in users:
+            user.recipes_preview = previews[user.pk]
+
     @action(methods=["POST", "DELETE"],
             detail=True,
             url_path="subscribe",
@@ -81,20 +146,23 @@ class FoodgramUserViewSet(UserViewSet):
     def subscribe(self, request, id):
         follower = request.user
         user = get_object_or_404(User, pk=id)
-        
+
         if request.method == "POST":
-            follow, created = Follow.objects.get_or_create(
-                follower=follower,
-                user=user
-            )
-            if (not created):
-                raise exceptions.ValidationError(
-                    f'Нельзя дважды на пользователя {user}!'
-                )
             if (follower == user):
                 raise exceptions.ValidationError(
                     'Нельзя подписываться на себя!'
                 )
+            with transaction.atomic():
+                follow, created = Follow.objects.get_or_create(
+                    follower=follower,
+                    user=user
+                )
+                if created:
+                    counters.follow_changed(follower.pk, user.pk, 1)
+            if (not created):
+                raise exceptions.ValidationError(
+                    f'Нельзя дважды на пользователя {user}!'
+                )
             serializer = serializers.FoodgramUserWithRecipesSerializer(
                 user, context=self.get_serializer_context()
             )
@@ -106,12 +174,14 @@ class FoodgramUserViewSet(UserViewSet):
             obj = Follow.objects.get(follower=follower, user=user) 
         except ObjectDoesNotExist: 
             raise exceptions.ValidationError("Такая подписка не существует") 
-        obj.delete() 
+        with transaction.atomic():
+            obj.delete()
+            counters.follow_changed(follower.pk, user.pk, -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = models.Recipe.objects.all()
+    queryset = models.Recipe.objects.defer("search_vector")
     filter_backends = [
         DjangoFilterBackend,
     ]
@@ -119,6 +189,73 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (AuthorOrReading,)
     pagination_class = PageLimitPagination
 
+    def get_queryset(self):
+        recipes = super().get_queryset().select_related("author")
+        user = self.request.user
+        if not user.is_authenticated:
+            return recipes.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return recipes.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef("pk"))),
+            is_in_shopping_cart=Exists(Cart.objects.filter(
+                user=user, recipe=OuterRef("pk"))),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                follower=user, user=OuterRef("author"))),
+        )
+
+    def list(self, request, *args, **kwargs):
+        author = request.query_params.get("author")
+        if author and author.isdigit():
+            scopes = (f"author:{author}", "ingredients")
+        else:
+            scopes = ("recipes",)
+        return self.cached_read(
+            request,
+            scopes,
+            lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs),
+        )
+
+    def cached_read(self, request, scopes, render):
+        if request.user.is_authenticated:
+            return render()
+        return cached_response(request, scopes, render)
+
+    def retrieve(self, request, *args, **kwargs):
+        stamp = get_or_404(
+            self.get_queryset().annotate(
+                ingredients_updated_at=Max("ingredients__updated_at")
+            ).values_list(
+                "updated_at",
+                "author__updated_at",
+                "ingredients_updated_at",
+                "is_favorited",
+                "is_in_shopping_cart",
+                "author_is_subscribed",
+            ),
+            pk=kwargs["pk"],
+        )
+        personalized = request.user.is_authenticated
+        return conditional_response(
+            request,
+            lambda: self.cached_read(
+                request,
+                ("recipes",),
+                lambda: super(RecipeViewSet, self).retrieve(
+                    request, *args, **kwargs),
+            ),
+            etag=make_etag(*stamp),
+            last_modified=(
+                None if personalized
+                else max(filter(None, stamp[:3]))
+            ),
+            personalized=personalized,
+        )
+
     def get_serializer_class(self):
         if self.action == 'favorite' or self.action == 'shopping_cart':
             return serializers.ForReadRecipeSerializer
@@ -132,13 +269,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        counters.recipes_deleted(
+            models.Recipe.objects.filter(pk=instance.pk)
+        )
+        instance.delete()
+
     def add_delete_fav_cart(self, model, pk):
         recipe = get_object_or_404(models.Recipe, pk=pk)
 
         if self.request.method == "POST":
-            object, created = model.objects.get_or_create(
-                user=self.request.user,
-                recipe=recipe)
+            with transaction.atomic():
+                object, created = model.objects.get_or_create(
+                    user=self.request.user,
+                    recipe=recipe)
+                if created:
+                    counters.fav_cart_changed(model, [recipe.pk], 1)
             if not created:
                 raise exceptions.ValidationError(
                     f"Рецепт {recipe.name} в \
@@ -161,25 +308,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
             raise exceptions.ValidationError(
                 f"Рецепт {recipe.name} в \
                       {model.__class__.__name__} не существует!")
-        object.delete() 
+        with transaction.atomic():
+            object.delete()
+            counters.fav_cart_changed(model, [recipe.pk], -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def bulk_fav_cart(self, model):
+        serializer = serializers.RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["recipes"]
+        adding = self.request.method == "POST"
+        # Сначала проверяются id, чтобы результат для каждого был известен
+        # заранее; параллельная вставка той же пары стоит одного повтора.
+        for retry in (True, False):
+            try:
+                with transaction.atomic():
+                    results = self.apply_fav_cart(model, ids, adding)
+                break
+            except IntegrityError:
+                if not retry:
+                    raise
+        return Response({"results": [
+            {"id": pk, "status": results.get(pk, "not_found")}
+            for pk in ids
+        ]})
+
+    def apply_fav_cart(self, model, ids, adding):
+        user = self.request.user
+        present = dict(
+            models.Recipe.objects.filter(pk__in=ids).annotate(
+                present=Exists(model.objects.filter(
+                    user=user, recipe=OuterRef("pk")))
+            ).values_list("pk", "present")
+        )
+        if adding:
+            changed = [pk for pk, exists in present.items() if not exists]
+            model.objects.bulk_create(
+                model(user=user, recipe_id=pk) for pk in changed
+            )
+            if model is Cart:
+                add_recipes(user.pk, changed)
+            counters.fav_cart_changed(model, changed, 1)
+            statuses = ("exists", "created")
+        else:
+            changed = [pk for pk, exists in present.items() if exists]
+            if changed:
+                with deferred_removals():
+                    model.objects.filter(
+                        user=user, recipe__in=changed
+                    ).delete()
+                counters.fav_cart_changed(model, changed, -1)
+            statuses = ("missing", "deleted")
+        changed = set(changed)
+        return {pk: statuses[pk in changed] for pk in present}
+
     @action(detail=True,
             methods=["post", "delete"],
             permission_classes=[permissions.IsAuthenticated])
     def favorite(self, request, pk):
         return self.add_delete_fav_cart(Favorite, pk)
 
+    @action(detail=False,
+            methods=["post", "delete"],
+            url_path="favorite",
+            permission_classes=[permissions.IsAuthenticated])
+    def favorites(self, request):
+        return self.bulk_fav_cart(Favorite)
+
     @action(detail=True,
             methods=["post", "delete"],
             permission_classes=[permissions.IsAuthenticated])
     def shopping_cart(self, request, pk):
         return self.add_delete_fav_cart(Cart, pk)
     
+    @action(detail=False,
+            methods=["get"],
+            url_path="shopping_cart",
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_list(self, request):
+        items = request.user.shopping_list.select_related(
+            "ingredient"
+        ).order_by("ingredient__name")
+        return Response(
+            serializers.ShoppingListItemSerializer(items, many=True).data
+        )
+
+    @shopping_list.mapping.post
+    @shopping_list.mapping.delete
+    def shopping_cart_bulk(self, request):
+        return self.bulk_fav_cart(Cart)
+
     @action(detail=True, methods=["get"], url_path="get-link")
     def get_short_link(self, request, pk=None):
+        short_code = get_or_404(
+            models.Recipe.objects.values_list("short_code", flat=True),
+            pk=pk,
+        )
         return Response({
-            'short-link': request.build_absolute_uri(f'/r/{pk}/')
+            'short-link': request.build_absolute_uri(f'/r/{short_code}/')
         })
 
     @action(
@@ -192,55 +418,45 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        cart_items = request.user.carts.select_related(
-            'recipe', 'recipe__author')
-        
-        with NamedTemporaryFile(mode='w+', suffix='.csv', 
-                                delete=False, encoding='utf-8') as temp_file:
-            writer = csv.writer(temp_file)
-            
-            writer.writerow([f"Список покупок \
-                            ({datetime.now().strftime('%Y-%m-%d %H:%M')})"])
-            writer.writerow([])
-            
-            writer.writerow(
-                ['№', 'Ингредиент', 'Количество', 'Единица измерения'])
-            
-            ingredients = {}
-            recipes = set()
-            
-            for item in cart_items:
-                recipes.add(f"{item.recipe.name} \
-                            (автор: {item.recipe.author.username})")
-                for product in item.recipe.products.all():
-                    key = (
-                        product.ingredient.name,
-                        product.ingredient.measurement_unit)
-                    ingredients[key] = ingredients.get(key, 0) + product.amount
-            
-            sorted_ingredients = sorted(
-                ingredients.items(), key=lambda x: x[0][0])
-            for idx, ((name, unit), amount) in enumerate(
-                    sorted_ingredients, start=1):
-                writer.writerow([idx, name.capitalize(), amount, unit])
-            
-            writer.writerow([])
-            writer.writerow(["Рецепты:"])
-            for recipe in sorted(recipes):
-                writer.writerow([f"- {recipe}"])
-            
-            temp_file_path = temp_file.name
-        
-        response = FileResponse(
-            open(temp_file_path, 'rb'),
-            content_type='text/csv',
-            as_attachment=True,
-            filename=f'shopping_list_{datetime.now().strftime("%Y%m%d")}.csv'
-        )
-        
-        response.callback = lambda: os.unlink(temp_file_path)
-        
-        return response
+        writer = csv.writer(EchoBuffer())
+        return StreamingHttpResponse(
+            (writer.writerow(row)
+             for row in self.shopping_list_rows(request.user)),
+            content_type="text/csv",
+            headers={
+                "Content-Disposition": (
+                    "attachment; filename="
+                    f'"shopping_list_{datetime.now().strftime("%Y%m%d")}.csv"'
+                )
+            },
+        )
+
+    def shopping_list_rows(self, user):
+        yield [
+            "Список покупок "
+            f"({datetime.now().strftime('%Y-%m-%d %H:%M')})"
+        ]
+        yield []
+        yield ["№", "Ингредиент", "Количество", "Единица измерения"]
+
+        ingredients = user.shopping_list.select_related(
+            "ingredient"
+        ).order_by("ingredient__name")
+        for idx, item in enumerate(ingredients.iterator(), start=1):
+            yield [
+                idx,
+                item.ingredient.name.capitalize(),
+                item.amount,
+                item.ingredient.measurement_unit,
+            ]
+
+        yield []
+        yield ["Рецепты:"]
+        recipes = models.Recipe.objects.filter(
+            carts__user=user
+        ).values_list("name", "author__username")
+        for name, username in recipes.iterator():
+            yield [f"- {name} (автор: {username})"]
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -250,3 +466,29 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        count, updated_at = ingredient_index.version
+        return conditional_response(
+            request,
+            lambda: Response(ingredient_index.search(
+                name or "",
+                limit=settings.INGREDIENT_SEARCH_LIMIT if name else None,
+            )),
+            etag=make_etag(count, updated_at),
+            last_modified=updated_at,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = get_or_404(
+            self.get_queryset().values_list("updated_at", flat=True),
+            pk=kwargs["pk"],
+        )
+        return conditional_response(
+            request,
+            lambda: super(IngredientViewSet, self).retrieve(
+                request, *args, **kwargs),
+            etag=make_etag(updated_at),
+            last_modified=updated_at,
+        )
+
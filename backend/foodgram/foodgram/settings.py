@@ -42,8 +42,10 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "api.apps.ApiConfig",
     "recipes.apps.RecipesConfig",
+    "jobs.apps.JobsConfig",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -95,6 +97,26 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT', 5432)   
     }
 }
+# Под ASGI каждый запрос выполняется в своём потоке и постоянные
+# соединения не переиспользуются, поэтому там по умолчанию включён общий
+# для процесса пул. Под WSGI постоянные соединения (CONN_MAX_AGE) в
+# benchmarks/pool.py не уступают пулу. Соединения проверяются перед
+# выдачей в обоих случаях.
+ASGI = os.getenv("ASGI", "False").lower() in ("true", "1", "yes")
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+if os.getenv("DB_POOL", str(ASGI)).lower() in ("true", "1", "yes"):
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 600)),
+        },
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(
+        os.getenv("DB_CONN_MAX_AGE", 60)
+    )
 
 # "ENGINE": "django.db.backends.sqlite3",
 #         "NAME": BASE_DIR / 'db.sqlite3'
@@ -123,7 +145,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 6,
@@ -145,6 +167,38 @@ DJOSER = {
         'current_user': 'api.serializers.FoodgramUserSerializer',
     }
 }
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300))
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT", 60))
+
+PAGINATION_COUNT_STRATEGY = os.getenv("PAGINATION_COUNT_STRATEGY", "exact")
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv("PAGINATION_COUNT_CACHE_TIMEOUT", 30)
+)
+PAGINATION_EXACT_COUNT_LIMIT = int(
+    os.getenv("PAGINATION_EXACT_COUNT_LIMIT", 10000)
+)
+
+SHORT_LINK_TIMEOUT = int(os.getenv("SHORT_LINK_TIMEOUT", 60 * 60 * 24))
+SHORT_LINK_FLUSH_INTERVAL = int(os.getenv("SHORT_LINK_FLUSH_INTERVAL", 60))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", 50))
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", 300))
+
+JOBS_MODE = os.getenv("JOBS_MODE", "worker")
+JOBS_THREADS = int(os.getenv("JOBS_THREADS", 2))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+JOBS_RETRY_DELAY = int(os.getenv("JOBS_RETRY_DELAY", 10))
+JOBS_VISIBILITY_TIMEOUT = int(os.getenv("JOBS_VISIBILITY_TIMEOUT", 300))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 1))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -173,6 +227,17 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv("IMAGE_UPLOAD_MAX_SIZE", 10 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv("IMAGE_UPLOAD_MAX_PIXELS", 40_000_000))
+
+IMAGE_RENDITIONS = {
+    "thumbnail": (480, 480),
+    "webp": None,
+}
+IMAGE_RENDITION_QUALITY = int(os.getenv("IMAGE_RENDITION_QUALITY", 80))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,11 @@
+import os
+
+bind = "0.0.0.0:8000"
+
+# По умолчанию WSGI; ASGI=True запускает те же представления под
+# uvicorn-воркерами.
+if os.getenv("ASGI", "False").lower() in ("true", "1", "yes"):
+    worker_class = "uvicorn_worker.UvicornWorker"
+    wsgi_app = "foodgram.asgi:application"
+else:
+    wsgi_app = "foodgram.wsgi:application"
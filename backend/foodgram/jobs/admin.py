@@ -0,0 +1,18 @@
+from django.contrib import admin
+from . import models
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'name',
+        'status',
+        'attempts',
+        'duration',
+        'created_at',
+        'finished_at',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('locked_until', 'locked_by', 'last_error', 'duration')
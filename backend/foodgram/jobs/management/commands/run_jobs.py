@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import runner
+
+
+class Command(BaseCommand):
+    help = 'Обработка фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Обработать доступные задачи и завершиться",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=10,
+            help="Сколько задач забирать за раз",
+        )
+        parser.add_argument(
+            "--stats", action="store_true",
+            help="Показать статистику очереди",
+        )
+        parser.add_argument(
+            "--purge", type=int, metavar="DAYS",
+            help="Удалить выполненные задачи старше DAYS дней",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for key, value in runner.stats().items():
+                self.stdout.write(f"{key}: {value}")
+            return
+        if options["purge"] is not None:
+            deleted = runner.purge(timedelta(days=options["purge"]))
+            self.stdout.write(self.style.SUCCESS(
+                f"Удалено задач: {deleted}"))
+            return
+        while True:
+            close_old_connections()
+            processed = runner.run_pending(options["batch"])
+            if options["once"] and not processed:
+                return
+            if not processed:
+                time.sleep(settings.JOBS_POLL_INTERVAL)
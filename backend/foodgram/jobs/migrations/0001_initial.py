@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Задача')),
+                ('payload', models.JSONField(default=dict, verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+                ('max_attempts', models.PositiveSmallIntegerField(verbose_name='Максимум попыток')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запустить после')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Заблокирована до')),
+                ('locked_by', models.CharField(blank=True, max_length=64, verbose_name='Обработчик')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('duration', models.FloatField(blank=True, null=True, verbose_name='Длительность, с')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx')],
+            },
+        ),
+    ]
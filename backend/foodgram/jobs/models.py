@@ -0,0 +1,49 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField("Задача", max_length=255)
+    payload = models.JSONField("Параметры", default=dict)
+    status = models.CharField(
+        "Статус", max_length=16, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField("Попытки", default=0)
+    max_attempts = models.PositiveSmallIntegerField("Максимум попыток")
+    run_after = models.DateTimeField("Запустить после", default=timezone.now)
+    locked_until = models.DateTimeField(
+        "Заблокирована до", null=True, blank=True
+    )
+    locked_by = models.CharField("Обработчик", max_length=64, blank=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    duration = models.FloatField(
+        "Длительность, с", null=True, blank=True
+    )
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    finished_at = models.DateTimeField(
+        "Дата завершения", null=True, blank=True
+    )
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"], name="job_status_run_after_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
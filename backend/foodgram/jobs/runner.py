@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def task(func):
+    TASKS[f"{func.__module__}.{func.__name__}"] = func
+    return func
+
+
+def enqueue(func, **payload):
+    name = f"{func.__module__}.{func.__name__}"
+    if TASKS.get(name) is not func:
+        raise ValueError(f"Задача {name} не зарегистрирована")
+    job = Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_MODE == "thread":
+        transaction.on_commit(lambda: submit(job.pk))
+    return job
+
+
+def claim(limit, pk=None):
+    now = timezone.now()
+    jobs = Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    )
+    if pk is not None:
+        jobs = jobs.filter(pk=pk)
+    with transaction.atomic():
+        claimed = list(
+            jobs.select_for_update(skip_locked=True)
+            .order_by("run_after")[:limit]
+        )
+        if not claimed:
+            return []
+        token = uuid.uuid4().hex
+        locked_until = now + timedelta(
+            seconds=settings.JOBS_VISIBILITY_TIMEOUT
+        )
+        Job.objects.filter(pk__in=[job.pk for job in claimed]).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_until=locked_until,
+            locked_by=token,
+        )
+    for job in claimed:
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.locked_until = locked_until
+        job.locked_by = token
+    return claimed
+
+
+def retry_delay(attempts):
+    return settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def finish(job, **fields):
+    # Воркер, не уложившийся в таймаут видимости, не должен затереть
+    # результат того, кто взял задачу после него.
+    return Job.objects.filter(
+        pk=job.pk, locked_by=job.locked_by, attempts=job.attempts
+    ).update(locked_until=None, **fields)
+
+
+def execute(job):
+    if job.attempts > job.max_attempts:
+        finish(
+            job,
+            status=Job.FAILED,
+            finished_at=timezone.now(),
+            last_error="Превышено время выполнения",
+        )
+        return Job.FAILED
+    func = TASKS.get(job.name)
+    started = time.monotonic()
+    try:
+        if func is None:
+            raise LookupError(f"Задача {job.name} не зарегистрирована")
+        func(**job.payload)
+    except Exception:
+        duration = time.monotonic() - started
+        error = traceback.format_exc()
+        logger.warning(
+            "Задача %s #%s завершилась ошибкой:\n%s", job.name, job.pk, error
+        )
+        if job.attempts < job.max_attempts:
+            finish(
+                job,
+                status=Job.PENDING,
+                run_after=timezone.now() + timedelta(
+                    seconds=retry_delay(job.attempts)
+                ),
+                last_error=error,
+                duration=duration,
+            )
+            return Job.PENDING
+        finish(
+            job,
+            status=Job.FAILED,
+            finished_at=timezone.now(),
+            last_error=error,
+            duration=duration,
+        )
+        return Job.FAILED
+    finish(
+        job,
+        status=Job.DONE,
+        finished_at=timezone.now(),
+        duration=time.monotonic() - started,
+    )
+    return Job.DONE
+
+
+def run_pending(limit):
+    jobs = claim(limit)
+    for job in jobs:
+        execute(job)
+    return len(jobs)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.JOBS_THREADS,
+                thread_name_prefix="jobs",
+            )
+        return _executor
+
+
+def submit(pk, delay=0):
+    if delay:
+        timer = threading.Timer(delay, submit, (pk,))
+        timer.daemon = True
+        timer.start()
+        return
+    get_executor().submit(run_in_thread, pk)
+
+
+def run_in_thread(pk):
+    close_old_connections()
+    try:
+        for job in claim(1, pk=pk):
+            if execute(job) == Job.PENDING:
+                submit(pk, delay=retry_delay(job.attempts))
+    except Exception:
+        logger.exception("Не удалось выполнить задачу #%s", pk)
+    finally:
+        connection.close()
+
+
+def stats():
+    now = timezone.now()
+    by_status = dict(
+        Job.objects.order_by().values_list("status").annotate(Count("pk"))
+    )
+    totals = Job.objects.filter(status=Job.DONE).aggregate(
+        avg_duration=Avg("duration")
+    )
+    oldest = Job.objects.filter(status=Job.PENDING).aggregate(
+        oldest=Min("run_after")
+    )["oldest"]
+    return {
+        **{status: by_status.get(status, 0) for status, _ in Job.STATUSES},
+        "avg_duration": totals["avg_duration"],
+        "oldest_pending_age": (
+            (now - oldest).total_seconds() if oldest else None
+        ),
+    }
+
+
+def purge(older_than):
+    return Job.objects.filter(
+        status=Job.DONE, finished_at__lt=timezone.now() - older_than
+    ).delete()[0]
@@ -1,32 +1,48 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.safestring import mark_safe
+from api.paginators import EstimatedCountPaginator
 from . import models
 from django.contrib.admin import display
 
+# Поля связанного рецепта, которые не нужны ни спискам, ни __str__.
+HEAVY_RECIPE_FIELDS = ("recipe__text", "recipe__search_vector")
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 class ProductInRecipeInline(admin.StackedInline):
     model = models.ProductInRecipe
     extra = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 @admin.register(models.Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(EstimatedCountAdmin):
     list_display = (
         'id',
         'name',
         'image',
         'cooking_time',
         'author',
-        'fav_count'
+        'favorites_count'
     )
-    list_filter = ('author',)
+    list_select_related = ('author',)
     search_fields = ("author__username", "name")
+    autocomplete_fields = ('author',)
     inlines = (ProductInRecipeInline,)
 
-    @display(description='Избранное')
-    def fav_count(self, recipe):
-        return recipe.favorites.count()
+    def get_queryset(self, request):
+        # Recipe.__str__ в виджетах автодополнения читает author.username.
+        return super().get_queryset(request).select_related(
+            "author"
+        ).defer("search_vector")
 
     @display(description='Аватар')
     @mark_safe
@@ -35,18 +51,16 @@ class RecipeAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('name', 'measurement_unit', 'recipe_count')
+class IngredientAdmin(EstimatedCountAdmin):
+    list_display = ('name', 'measurement_unit', 'recipes_count')
     search_fields = ("name", "measurement_unit")
     list_filter = ('measurement_unit',)
 
-    @display(description='Рецептов')
-    def recipe_count(self, ingredient):
-        return ingredient.products.count()
-
 
 @admin.register(models.FoodgramUser)
 class FoodgramUserAdmin(UserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ("username", 'email')
     list_display = (
         "id",
@@ -55,22 +69,10 @@ class FoodgramUserAdmin(UserAdmin):
         'email',
         'avatar',
         'recipes_count',
-        'follow_count',
+        'following_count',
         'followers_count'
     )
 
-    @display(description='Рецептов')
-    def recipes_count(self, user):
-        return user.recipes.count()
-
-    @display(description='Подписчиков')
-    def followers_count(self, user):
-        return user.follows_user.count()
-
-    @display(description='Подписок')
-    def follow_count(self, user):
-        return user.follows_follower.count()
-
     @display(description='ФИО')
     def FIO(self, user):
         return f'{user.last_name} {user.first_name}'
@@ -80,7 +82,41 @@ class FoodgramUserAdmin(UserAdmin):
         return f'<img src="{user.avatar}">'
 
 
-admin.site.register(models.ProductInRecipe)
-admin.site.register(models.Cart)
-admin.site.register(models.Favorite)
-admin.site.register(models.Follow)
+@admin.register(models.ProductInRecipe)
+class ProductInRecipeAdmin(EstimatedCountAdmin):
+    list_display = ('recipe', 'ingredient', 'amount')
+    search_fields = ('recipe__name', 'ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'recipe__author', 'ingredient'
+        ).defer(*HEAVY_RECIPE_FIELDS)
+
+
+@admin.register(models.Cart, models.Favorite)
+class FavCartAdmin(EstimatedCountAdmin):
+    list_display = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'user', 'recipe', 'recipe__author'
+        ).defer(*HEAVY_RECIPE_FIELDS)
+
+
+@admin.register(models.Follow)
+class FollowAdmin(EstimatedCountAdmin):
+    list_display = ('follower', 'user')
+    list_select_related = ('follower', 'user')
+    search_fields = ('follower__username', 'user__username')
+    autocomplete_fields = ('follower', 'user')
+
+
+@admin.register(models.ShoppingListItem)
+class ShoppingListItemAdmin(EstimatedCountAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
+    search_fields = ('user__username', 'ingredient__name')
+    autocomplete_fields = ('user', 'ingredient')
@@ -0,0 +1,123 @@
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Cart, Favorite, Follow, Ingredient, ProductInRecipe, Recipe, User
+)
+
+FAV_CART_FIELDS = {Favorite: "favorites_count", Cart: "carts_count"}
+
+# (модель, поле счётчика, связанная модель, поле связи, считаемое поле)
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe", "pk"),
+    (Recipe, "carts_count", Cart, "recipe", "pk"),
+    (Ingredient, "recipes_count", ProductInRecipe, "ingredient", "recipe"),
+    (User, "recipes_count", Recipe, "author", "pk"),
+    (User, "followers_count", Follow, "user", "pk"),
+    (User, "following_count", Follow, "follower", "pk"),
+)
+
+
+def shift(queryset, field, delta=1):
+    return queryset.update(**{field: F(field) + delta})
+
+
+def shift_each(model, field, deltas):
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return model.objects.filter(pk__in=deltas).update(**{
+        field: F(field) + Case(
+            *(When(pk=pk, then=delta) for pk, delta in deltas.items()),
+            default=0,
+        )
+    })
+
+
+def fav_cart_changed(model, recipe_ids, delta):
+    if recipe_ids:
+        shift(
+            Recipe.objects.filter(pk__in=recipe_ids),
+            FAV_CART_FIELDS[model],
+            delta,
+        )
+
+
+def follow_changed(follower_id, user_id, delta):
+    shift(User.objects.filter(pk=user_id), "followers_count", delta)
+    shift(User.objects.filter(pk=follower_id), "following_count", delta)
+
+
+def recipe_created(recipe, ingredient_ids):
+    shift(User.objects.filter(pk=recipe.author_id), "recipes_count")
+    ingredients_changed(ingredient_ids, ())
+
+
+def ingredients_changed(added, removed):
+    shift_each(Ingredient, "recipes_count", {
+        **{pk: 1 for pk in added},
+        **{pk: -1 for pk in removed},
+    })
+
+
+def recipes_deleted(recipes):
+    """Вызывается до удаления рецептов из queryset recipes."""
+    shift_each(User, "recipes_count", {
+        row["author"]: -row["total"]
+        for row in recipes.order_by().values("author").annotate(
+            total=Count("pk")
+        )
+    })
+    shift_each(Ingredient, "recipes_count", {
+        row["ingredient"]: -row["total"]
+        for row in ProductInRecipe.objects.filter(
+            recipe__in=recipes.values("pk")
+        ).order_by().values("ingredient").annotate(
+            total=Count("recipe", distinct=True)
+        )
+    })
+
+
+def user_deleted(user):
+    """Вызывается до удаления пользователя."""
+    recipes_deleted(Recipe.objects.filter(author=user))
+    shift(
+        User.objects.filter(follows_user__follower=user),
+        "followers_count",
+        -1,
+    )
+    shift(
+        User.objects.filter(follows_follower__user=user),
+        "following_count",
+        -1,
+    )
+    for model, field in FAV_CART_FIELDS.items():
+        shift(
+            Recipe.objects.filter(
+                pk__in=model.objects.filter(user=user).exclude(
+                    recipe__author=user
+                ).values("recipe")
+            ),
+            field,
+            -1,
+        )
+
+
+def actual_count(related_model, related_field, counted_field):
+    return Coalesce(Subquery(
+        related_model.objects.filter(
+            **{related_field: OuterRef("pk")}
+        ).order_by().values(related_field).annotate(
+            total=Count(counted_field, distinct=True)
+        ).values("total")
+    ), 0)
+
+
+def recount():
+    repaired = {}
+    for model, field, *related in COUNTERS:
+        actual = actual_count(*related)
+        repaired[f"{model._meta.model_name}.{field}"] = model.objects.filter(
+            ~Q(**{field: actual})
+        ).update(**{field: actual})
+    return repaired
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_shopping_lists(apps, schema_editor):
+    ProductInRecipe = apps.get_model('recipes', 'ProductInRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    totals = ProductInRecipe.objects.filter(
+        recipe__carts__isnull=False
+    ).values('recipe__carts__user', 'ingredient').annotate(
+        total=Sum('amount')
+    ).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=row['recipe__carts__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total'],
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_alter_foodgramuser_options_alter_recipe_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cart',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Позиция списка покупок',
+                'verbose_name_plural': 'Списки покупок',
+                'constraints': [models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_ingredient')],
+            },
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:40
+
+import recipes.models
+from django.db import migrations, models
+
+
+def fill_short_codes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    used = set()
+    batch = []
+    for recipe in Recipe.objects.only('pk').iterator():
+        code = recipes.models.generate_short_code()
+        while code in used:
+            code = recipes.models.generate_short_code()
+        used.add(code)
+        recipe.short_code = code
+        batch.append(recipe)
+    Recipe.objects.bulk_update(batch, ['short_code'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='clicks',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Переходов по ссылке'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(editable=False, max_length=6, null=True, verbose_name='Короткий код'),
+        ),
+        migrations.RunPython(fill_short_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(default=recipes.models.generate_short_code, editable=False, max_length=6, unique=True, verbose_name='Короткий код'),
+        ),
+    ]
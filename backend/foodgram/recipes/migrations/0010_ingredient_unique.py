@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:21
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    ProductInRecipe = apps.get_model('recipes', 'ProductInRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), total=Count('id')).filter(
+        total__gt=1
+    ).order_by()
+    for row in duplicates:
+        extra = Ingredient.objects.filter(
+            name=row['name'], measurement_unit=row['measurement_unit']
+        ).exclude(pk=row['keep'])
+        for model, owner in (
+            (ProductInRecipe, 'recipe_id'),
+            (ShoppingListItem, 'user_id'),
+        ):
+            for item in model.objects.filter(ingredient__in=extra):
+                merged = model.objects.filter(
+                    ingredient_id=row['keep'],
+                    **{owner: getattr(item, owner)},
+                ).update(amount=F('amount') + item.amount)
+                if merged:
+                    item.delete()
+                else:
+                    item.ingredient_id = row['keep']
+                    item.save(update_fields=['ingredient'])
+        extra.delete()
+    # Отложенные проверки внешних ключей выполняются сразу, чтобы
+    # следующая операция в той же транзакции могла изменить таблицу.
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_short_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('Recipe', 'favorites_count', 'Favorite', 'recipe', 'pk'),
+    ('Recipe', 'carts_count', 'Cart', 'recipe', 'pk'),
+    ('Ingredient', 'recipes_count', 'ProductInRecipe', 'ingredient', 'recipe'),
+    ('FoodgramUser', 'recipes_count', 'Recipe', 'author', 'pk'),
+    ('FoodgramUser', 'followers_count', 'Follow', 'user', 'pk'),
+    ('FoodgramUser', 'following_count', 'Follow', 'follower', 'pk'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for model, field, related, related_field, counted in COUNTERS:
+        related = apps.get_model('recipes', related)
+        apps.get_model('recipes', model).objects.update(**{
+            field: Coalesce(Subquery(
+                related.objects.filter(
+                    **{related_field: OuterRef('pk')}
+                ).order_by().values(related_field).annotate(
+                    total=Count(counted, distinct=True)
+                ).values('total')
+            ), 0)
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписок'),
+        ),
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
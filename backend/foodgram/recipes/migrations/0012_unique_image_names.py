@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:02
+
+import recipes.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodgramuser',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, upload_to=recipes.models.avatar_upload_to, verbose_name='Аватар'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(upload_to=recipes.models.recipe_image_upload_to, verbose_name='Картинка'),
+        ),
+    ]
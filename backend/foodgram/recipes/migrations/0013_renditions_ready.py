@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_unique_image_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Превью готовы'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Превью готовы'),
+        ),
+    ]
@@ -1,12 +1,57 @@
-from django.db import models
+import secrets
+import string
+from pathlib import Path
+from uuid import uuid4
+
+from django.db import IntegrityError, models, transaction
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, RegexValidator
 
 
-class FoodgramUser(AbstractUser):
+def unique_name(folder, filename):
+    # Имена не повторяются, поэтому превью по ним можно кэшировать навсегда.
+    return f"{folder}/{uuid4().hex}{Path(filename).suffix.lower()}"
+
+
+def avatar_upload_to(instance, filename):
+    return unique_name("avatar_images", filename)
+
+
+def recipe_image_upload_to(instance, filename):
+    return unique_name("recipes", filename)
+
+
+class CounterFieldsMixin:
+    """Не записывает счётчики при обычном сохранении модели.
+
+    Счётчики меняются только через F()-обновления, поэтому сохранение
+    объекта, загруженного раньше, не должно перезаписывать их.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and not field.generated
+                and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class FoodgramUser(CounterFieldsMixin, AbstractUser):
     avatar = models.ImageField(
         "Аватар",
-        upload_to='avatar_images',
+        upload_to=avatar_upload_to,
         blank=True,
         null=True
     )
@@ -26,6 +71,20 @@ class FoodgramUser(AbstractUser):
     )
     first_name = models.CharField(max_length=150, verbose_name="Имя")
     last_name = models.CharField(max_length=150, verbose_name="Фамилия")
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+    renditions_ready = models.BooleanField(
+        "Превью готовы", default=False, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        "Рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        "Подписчиков", default=0, editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        "Подписок", default=0, editable=False
+    )
+    counter_fields = ("recipes_count", "followers_count", "following_count")
     REQUIRED_FIELDS = ["first_name", "last_name", 'username']
     USERNAME_FIELD = 'email'
 
@@ -41,29 +100,56 @@ class FoodgramUser(AbstractUser):
 User = FoodgramUser
 
 
-class Ingredient(models.Model):
+class Ingredient(CounterFieldsMixin, models.Model):
     name = models.TextField("Название", null=False)
 
     measurement_unit = models.TextField(
         "Единица измерения",
         null=False
     )
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+    recipes_count = models.PositiveIntegerField(
+        "Рецептов", default=0, editable=False
+    )
+    counter_fields = ("recipes_count",)
 
     class Meta:
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_unit'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.measurement_unit}"
 
 
-class Recipe(models.Model):
+SHORT_CODE_ALPHABET = string.digits + string.ascii_letters
+SHORT_CODE_LENGTH = 6
+SHORT_CODE_ATTEMPTS = 5
+
+
+def generate_short_code():
+    return "".join(
+        secrets.choice(SHORT_CODE_ALPHABET) for _ in range(SHORT_CODE_LENGTH)
+    )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     name = models.CharField(
         "Название",
         max_length=256,
     )
-    image = models.ImageField("Картинка", null=False, blank=False)
+    image = models.ImageField(
+        "Картинка",
+        upload_to=recipe_image_upload_to,
+        null=False,
+        blank=False,
+    )
     text = models.TextField("Описание", null=False, blank=False)
     cooking_time = models.IntegerField(
         "Время приготовления",
@@ -82,15 +168,77 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         related_name="recipes",
     )
+    short_code = models.CharField(
+        "Короткий код",
+        max_length=SHORT_CODE_LENGTH,
+        unique=True,
+        editable=False,
+        default=generate_short_code,
+    )
+    renditions_ready = models.BooleanField(
+        "Превью готовы", default=False, editable=False
+    )
+    clicks = models.PositiveIntegerField(
+        "Переходов по ссылке",
+        default=0,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        "В избранном",
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        "В корзинах",
+        default=0,
+        editable=False,
+    )
+    created_at = models.DateTimeField("Дата публикации", auto_now_add=True)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("name", weight="A", config="russian")
+            + SearchVector("text", weight="B", config="russian")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    counter_fields = ("clicks", "favorites_count", "carts_count")
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["name", "id"], name="recipe_name_id_idx"),
+            GinIndex(fields=["search_vector"], name="recipe_search_idx"),
+            GinIndex(
+                fields=["name"],
+                name="recipe_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.author.username}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # Случайный код может совпасть с уже занятым: берём новый.
+        for attempt in range(1, SHORT_CODE_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == SHORT_CODE_ATTEMPTS or not (
+                    Recipe.objects.filter(
+                        short_code=self.short_code
+                    ).exists()
+                ):
+                    raise
+                self.short_code = generate_short_code()
+
 
 class ProductInRecipe(models.Model):
     ingredient = models.ForeignKey(
@@ -185,3 +333,32 @@ class Cart(FavCartBase):
     class Meta(FavCartBase.Meta):
         verbose_name = "Корзина покупок"
         verbose_name_plural = "Корзины покупок"
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        FoodgramUser,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="shopping_list"
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+        related_name="shopping_list_items"
+    )
+    amount = models.IntegerField("Количество")
+
+    class Meta:
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Списки покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} - {self.ingredient_id} - {self.amount}'
@@ -0,0 +1,52 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+def rendition_name(name, rendition):
+    return f"renditions/{rendition}/{name}.webp"
+
+
+def generate(image_name, rendition, storage=default_storage):
+    size = settings.IMAGE_RENDITIONS[rendition]
+    name = rendition_name(image_name, rendition)
+    with storage.open(image_name) as original:
+        picture = Image.open(original)
+        if size:
+            picture.draft("RGB", size)
+        picture = ImageOps.exif_transpose(picture)
+        if size:
+            picture.thumbnail(size)
+        if picture.mode not in ("RGB", "RGBA"):
+            picture = picture.convert("RGBA")
+        buffer = BytesIO()
+        picture.save(
+            buffer, "WEBP", quality=settings.IMAGE_RENDITION_QUALITY
+        )
+    storage.delete(name)
+    storage.save(name, ContentFile(buffer.getvalue()))
+    return name
+
+
+def get_url(image, rendition):
+    if not image:
+        return None
+    # Флаг ставит задача generate_renditions, чтобы не проверять
+    # хранилище при каждом ответе.
+    if not getattr(image.instance, "renditions_ready", False):
+        return image.url
+    return image.storage.url(rendition_name(image.name, rendition))
+
+
+def generate_missing(image_name, storage=default_storage):
+    for rendition in settings.IMAGE_RENDITIONS:
+        if not storage.exists(rendition_name(image_name, rendition)):
+            generate(image_name, rendition, storage)
+
+
+def delete(image_name, storage=default_storage):
+    for rendition in settings.IMAGE_RENDITIONS:
+        storage.delete(rendition_name(image_name, rendition))
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import local
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .models import Cart, ProductInRecipe, ShoppingListItem
+
+_deferred = local()
+
+
+def recipe_totals(recipes):
+    return dict(
+        ProductInRecipe.objects.filter(
+            recipe__in=recipes
+        ).values("ingredient").annotate(
+            total=Sum("amount")
+        ).values_list("ingredient", "total")
+    )
+
+
+def add_recipes(user_id, recipes):
+    apply_deltas([user_id], recipe_totals(recipes))
+
+
+def remove_recipes(user_id, recipes):
+    removed = getattr(_deferred, "removed", None)
+    if removed is not None:
+        removed[user_id].extend(recipes)
+        return
+    apply_deltas([user_id], {
+        ingredient: -total
+        for ingredient, total in recipe_totals(recipes).items()
+    })
+
+
+@contextmanager
+def deferred_removals():
+    """Собирает удаления из корзины и применяет их одним пересчётом."""
+    _deferred.removed = removed = defaultdict(list)
+    try:
+        yield
+    finally:
+        del _deferred.removed
+    for user_id, recipes in removed.items():
+        remove_recipes(user_id, recipes)
+
+
+def change_recipe(recipe, old_amounts, new_amounts):
+    deltas = {
+        ingredient: new_amounts.get(ingredient, 0)
+        - old_amounts.get(ingredient, 0)
+        for ingredient in old_amounts.keys() | new_amounts.keys()
+    }
+    user_ids = Cart.objects.filter(
+        recipe=recipe
+    ).values_list("user", flat=True)
+    apply_deltas(list(user_ids), deltas)
+
+
+def apply_deltas(user_ids, deltas):
+    deltas = {
+        ingredient: delta for ingredient, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+
+    table = ShoppingListItem._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Атомарное сложение в одном запросе: строку, которой ещё нет,
+        # нельзя заблокировать, а параллельные вставки иначе конфликтуют.
+        # Строки идут в одном порядке, чтобы не было взаимных блокировок.
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, ingredient_id, amount) "
+            "SELECT users.id, deltas.ingredient, deltas.delta "
+            "FROM unnest(%s::bigint[]) AS users (id) "
+            "CROSS JOIN unnest(%s::bigint[], %s::integer[]) "
+            "AS deltas (ingredient, delta) "
+            "ORDER BY users.id, deltas.ingredient "
+            "ON CONFLICT (user_id, ingredient_id) "
+            f"DO UPDATE SET amount = {table}.amount + EXCLUDED.amount",
+            [sorted(set(user_ids)), list(deltas), list(deltas.values())],
+        )
+        ShoppingListItem.objects.filter(
+            user__in=user_ids, ingredient__in=deltas, amount__lte=0
+        ).delete()
+
+
+def rebuild(user_id):
+    with transaction.atomic():
+        ShoppingListItem.objects.filter(user=user_id).delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient, amount=total
+            )
+            for ingredient, total in recipe_totals(
+                Cart.objects.filter(user=user_id).values("recipe")
+            ).items()
+        )
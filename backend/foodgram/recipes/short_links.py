@@ -0,0 +1,65 @@
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, When
+
+from .models import Recipe
+
+
+_lock = threading.Lock()
+_clicks = Counter()
+_last_flush = time.monotonic()
+
+
+def cache_key(code):
+    return f"short_link:{code}"
+
+
+def resolve(code):
+    recipe_id = cache.get(cache_key(code))
+    if recipe_id is None:
+        recipe_id = Recipe.objects.filter(
+            short_code=code
+        ).values_list("pk", flat=True).first()
+        if recipe_id is None and code.isdigit():
+            recipe_id = Recipe.objects.filter(
+                pk=code
+            ).values_list("pk", flat=True).first()
+        if recipe_id is None:
+            return None
+        cache.set(cache_key(code), recipe_id, settings.SHORT_LINK_TIMEOUT)
+    return recipe_id
+
+
+def forget(code):
+    cache.delete(cache_key(code))
+
+
+def record_click(recipe_id):
+    with _lock:
+        _clicks[recipe_id] += 1
+        due = (time.monotonic() - _last_flush
+               >= settings.SHORT_LINK_FLUSH_INTERVAL)
+    if due:
+        flush()
+
+
+def flush():
+    global _clicks, _last_flush
+    with _lock:
+        pending, _clicks = _clicks, Counter()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    Recipe.objects.filter(pk__in=pending).update(clicks=F("clicks") + Case(
+        *(When(pk=recipe_id, then=count)
+          for recipe_id, count in pending.items()),
+        default=0,
+    ))
+
+
+atexit.register(flush)
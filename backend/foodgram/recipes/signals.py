@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+from threading import local
+
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from jobs.runner import enqueue
+
+from . import shopping_list, short_links, tasks
+from .models import Cart, ProductInRecipe, Recipe, User
+
+IMAGE_FIELDS = {Recipe: "image", User: "avatar"}
+
+_saving = local()
+
+
+@contextmanager
+def products_saved_with_recipe():
+    """Изменения продуктов внутри блока не сохраняют рецепт повторно."""
+    _saving.with_recipe = True
+    try:
+        yield
+    finally:
+        del _saving.with_recipe
+
+
+@receiver(post_save, sender=Cart)
+def cart_added(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Cart)
+def cart_removed(sender, instance, **kwargs):
+    shopping_list.remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_save, sender=ProductInRecipe)
+@receiver(post_delete, sender=ProductInRecipe)
+def product_changed(sender, instance, origin=None, **kwargs):
+    # Продукты удаляемого рецепта или автора не меняют сам рецепт.
+    if getattr(_saving, "with_recipe", False) or isinstance(origin, (Recipe, User)) or (
+        getattr(origin, "model", None) in (Recipe, User)
+    ):
+        return
+    recipe = Recipe.objects.filter(pk=instance.recipe_id).first()
+    if recipe is not None:
+        # Сохранение рецепта обновляет updated_at и сбрасывает кэш ответов.
+        recipe.save(update_fields=["updated_at"])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    short_links.forget(instance.short_code)
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+def image_changing(sender, instance, update_fields=None, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    image = getattr(instance, field)
+    uploaded = bool(image) and not image._committed
+    if image and not uploaded:
+        return
+    instance.renditions_ready = False
+    old_name = None
+    if instance.pk:
+        old_name = sender.objects.filter(pk=instance.pk).values_list(
+            field, flat=True
+        ).first()
+    instance._image_changes = (old_name, uploaded)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def image_changed(sender, instance, **kwargs):
+    changes = instance.__dict__.pop("_image_changes", None)
+    if changes is None:
+        return
+    old_name, uploaded = changes
+    image = getattr(instance, IMAGE_FIELDS[sender])
+    if uploaded:
+        enqueue(tasks.generate_renditions, name=image.name)
+    if old_name and old_name != image.name:
+        enqueue(tasks.delete_media, names=[old_name])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def image_owner_deleted(sender, instance, **kwargs):
+    image = getattr(instance, IMAGE_FIELDS[sender])
+    if image:
+        enqueue(tasks.delete_media, names=[image.name])
@@ -0,0 +1,31 @@
+from django.core.files.storage import default_storage
+
+from jobs.runner import task
+
+from . import renditions
+from .models import Recipe, User
+
+
+@task
+def generate_renditions(name):
+    if not default_storage.exists(name):
+        return
+    renditions.generate_missing(name)
+    # Флаг ставится одним запросом по имени, чтобы не отметить готовым
+    # изображение, заменённое за время генерации.
+    Recipe.objects.filter(image=name).update(renditions_ready=True)
+    User.objects.filter(avatar=name).update(renditions_ready=True)
+    # Сохранение владельцев сбрасывает кэш ответов с оригиналом вместо
+    # превью.
+    for owner in [
+        *Recipe.objects.defer("search_vector").filter(image=name),
+        *User.objects.filter(avatar=name),
+    ]:
+        owner.save(update_fields=["updated_at"])
+
+
+@task
+def delete_media(names):
+    for name in names:
+        renditions.delete(name)
+        default_storage.delete(name)
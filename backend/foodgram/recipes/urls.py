@@ -3,5 +3,5 @@ from .views import link_handler
 
 
 urlpatterns = [
-    path('<int:pk>/', link_handler, name='link_handler'),
-]
\ No newline at end of file
+    path('<str:code>/', link_handler, name='link_handler'),
+]
@@ -1,9 +1,14 @@
-from rest_framework.decorators import api_view
-from django.shortcuts import redirect, get_object_or_404
-from .models import Recipe
+from django.http import Http404
+from django.shortcuts import redirect
+from django.views.decorators.http import require_GET
 
+from . import short_links
 
-@api_view(["get",])
-def link_handler(request, pk):
-    get_object_or_404(Recipe, pk=pk)
-    return redirect(f"/api/recipes/{pk}/")
+
+@require_GET
+def link_handler(request, code):
+    recipe_id = short_links.resolve(code)
+    if recipe_id is None:
+        raise Http404
+    short_links.record_click(recipe_id)
+    return redirect(f"/recipes/{recipe_id}")